@@ -1,17 +1,22 @@
 """MTA Arrivals Board API - Real-time NYC subway arrivals, weather, and AQI."""
 
+import asyncio
 import os
+import secrets
 import time
-import uuid
 from contextlib import asynccontextmanager
+from typing import NotRequired, TypedDict
 
-import httpx
+import aiohttp
 import structlog
 from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from google.protobuf.internal import api_implementation
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from services import mta, weather, aqi
+from services import mta, openmeteo
 
 # Configure structured logging
 structlog.configure(
@@ -27,48 +32,102 @@ structlog.configure(
 )
 log = structlog.get_logger()
 
-http_client: httpx.AsyncClient | None = None
+# Identify ourselves to upstream APIs on every request
+USER_AGENT = "mta-arrivals-board (github.com/benarnav/arrivals-board)"
+
+# Take alerts from the GTFS-realtime feeds instead of the separate MTA alerts feed.
+# Saves a round-trip, but subway feeds carry far fewer alerts than the JSON feed.
+MTA_FEED_ALERTS = os.environ.get("MTA_FEED_ALERTS", "").lower() in ("1", "true", "yes")
+
+# Weather/AQI are decorative; never hold up arrivals waiting on them for longer than this
+CONDITIONS_TIMEOUT_S = 0.5
+
+http_client: aiohttp.ClientSession | None = None
+
+# Strong references to fetches left running after CONDITIONS_TIMEOUT_S
+_background_tasks: set[asyncio.Task] = set()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global http_client
-    http_client = httpx.AsyncClient()
-    log.info("startup")
+    http_client = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=128, limit_per_host=32, ttl_dns_cache=300, keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(total=10, connect=3),
+        headers={"User-Agent": USER_AGENT},
+    )
+    # GTFS parsing is the main CPU cost; the pure-Python protobuf backend is far slower
+    protobuf_backend = api_implementation.Type()
+    if protobuf_backend == "python":
+        log.warning("protobuf_pure_python", protobuf_backend=protobuf_backend)
+    log.info("startup", protobuf_backend=protobuf_backend)
     yield
-    await http_client.aclose()
+
+    # Stop conditions fetches left running past their deadline before closing the session they use
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await http_client.close()
     log.info("shutdown")
 
 
-app = FastAPI(title="MTA Arrivals API", version="2.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="MTA Arrivals API",
+    version="2.0.0",
+    lifespan=lifespan,
+)
 
 
-@app.middleware("http")
-async def request_context(request: Request, call_next):
-    """Add request ID and timing to all requests."""
-    request_id = str(uuid.uuid4())[:8]
-    structlog.contextvars.clear_contextvars()
-    structlog.contextvars.bind_contextvars(request_id=request_id)
-    
-    start = time.perf_counter()
-    response = await call_next(request)
-    duration_ms = int((time.perf_counter() - start) * 1000)
-    
-    log.info(
-        "request",
-        method=request.method,
-        path=request.url.path,
-        status=response.status_code,
-        duration_ms=duration_ms,
-    )
-    response.headers["X-Request-ID"] = request_id
-    return response
+class RequestContextMiddleware:
+    """Add request ID and timing to all requests (pure ASGI, no BaseHTTPMiddleware overhead)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = secrets.token_hex(4)
+        structlog.contextvars.bind_contextvars(request_id=request_id)
+
+        status = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            log.info(
+                "request",
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=duration_ms,
+            )
+            # Don't let this request's log context bleed into the next one
+            structlog.contextvars.clear_contextvars()
+
+
+app.add_middleware(RequestContextMiddleware)
+
+
+# Request headers echoed in validation errors; api-key is deliberately excluded
+_LOG_HEADER_PREFIXES = ("station", "subway", "lat", "long")
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_error_handler(request: Request, exc: RequestValidationError):
     errors = [{"field": e["loc"][-1], "type": e["type"]} for e in exc.errors()]
-    headers = {k: v for k, v in request.headers.items() if k.startswith(("api", "station", "subway", "lat", "long"))}
+    headers = {k: v for k, v in request.headers.items() if k.startswith(_LOG_HEADER_PREFIXES)}
     
     log.warning("validation_error", errors=errors, headers=headers)
     
@@ -86,8 +145,55 @@ def validate_api_key(key: str) -> None:
         raise HTTPException(401, "Invalid API key")
 
 
+def _finish_background_task(task: asyncio.Task) -> None:
+    """Drop a finished background fetch and log any exception it raised."""
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.error("background_task_failed", error=repr(task.exception()))
+
+
+async def get_conditions_with_deadline(lat: float, lon: float) -> openmeteo.Conditions:
+    """Fetch weather/AQI, falling back to the last known values if upstream is slow."""
+    fetch = asyncio.ensure_future(openmeteo.get_conditions(lat, lon, http_client))
+    try:
+        return await asyncio.wait_for(asyncio.shield(fetch), CONDITIONS_TIMEOUT_S)
+    except TimeoutError:
+        # Let the fetch finish in the background so it refreshes the cache for the next poll
+        _background_tasks.add(fetch)
+        fetch.add_done_callback(_finish_background_task)
+        log.warning("conditions_timeout", timeout_s=CONDITIONS_TIMEOUT_S)
+        return openmeteo.get_cached_conditions(lat, lon)
+
+
+# Response shape the firmware parses; the return type lets Pydantic serialize it directly
+ArrivalEntry = TypedDict(
+    "ArrivalEntry",
+    {"Line": str, "N-S": str, "Direction": str, "Arrival": int},
+)
+
+
+class WeatherEntry(TypedDict):
+    temp_f: int
+    feels_like_f: int | None
+    conditions: str
+
+
+class AqiEntry(TypedDict):
+    value: int
+    level: int
+
+
+class ArrivalsResponse(TypedDict):
+    North: list[ArrivalEntry]
+    South: list[ArrivalEntry]
+    alerts: list[str]
+    # Omitted rather than null when unavailable, as the firmware expects
+    weather: NotRequired[WeatherEntry]
+    aqi: NotRequired[AqiEntry]
+
+
 @app.get("/")
-async def health():
+async def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
@@ -98,35 +204,63 @@ async def get_arrivals(
     subway_lines: str = Header(..., alias="subway-lines"),
     latitude: str = Header(...),
     longitude: str = Header(...),
-):
+) -> ArrivalsResponse:
     validate_api_key(api_key)
     
     stations = {s.strip() for s in station_ids.split(",")}
     lines = {l.strip() for l in subway_lines.split(",")}
     
     try:
-        lat, lon = float(latitude), float(longitude)
+        # 3 decimals (~100m) so repeat polls share upstream caches and URLs
+        lat, lon = round(float(latitude), 3), round(float(longitude), 3)
     except ValueError:
         log.error("invalid_coords", latitude=latitude, longitude=longitude)
         raise HTTPException(400, f"Invalid coordinates: {latitude}, {longitude}")
     
     structlog.contextvars.bind_contextvars(stations=list(stations), lines=list(lines))
     
-    # Fetch data with timing
-    t0 = time.perf_counter()
-    arrivals = await mta.get_arrivals(stations, lines, http_client)
-    t_arrivals = time.perf_counter()
-    
-    alerts = await mta.get_alerts(lines, http_client)
-    t_alerts = time.perf_counter()
-    
-    weather_data = await weather.get_weather(lat, lon, http_client)
-    t_weather = time.perf_counter()
-    
-    aqi_data = await aqi.get_aqi(lat, lon, http_client)
-    t_aqi = time.perf_counter()
+    # Fetch all upstreams concurrently, timing each one individually
+    spans: dict[str, int] = {}
+
+    async def timed(name: str, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            spans[f"{name}_ms"] = int((time.perf_counter() - start) * 1000)
+
+    upstreams = {
+        "mta": mta.get_arrivals(stations, lines, http_client, include_alerts=MTA_FEED_ALERTS),
+        "conditions": get_conditions_with_deadline(lat, lon),
+    }
+    if not MTA_FEED_ALERTS:
+        upstreams["alerts"] = mta.get_alerts(lines, http_client)
+
+    results = dict(zip(
+        upstreams,
+        await asyncio.gather(
+            *[timed(name, coro) for name, coro in upstreams.items()],
+            return_exceptions=True,
+        ),
+    ))
+
+    # Substitute an empty result for any upstream that raised
+    defaults = {
+        "mta": {"North": [], "South": []},
+        "alerts": [],
+        "conditions": openmeteo.Conditions(weather=None, aqi=None),
+    }
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            log.error("upstream_failed", service=name, error=repr(result))
+            results[name] = defaults[name]
+
+    arrivals = results["mta"]
+    alerts = arrivals.pop("alerts", []) if MTA_FEED_ALERTS else results["alerts"]
+    weather_data = results["conditions"].weather
+    aqi_data = results["conditions"].aqi
     
-    response = {**arrivals, "alerts": alerts}
+    response: ArrivalsResponse = {**arrivals, "alerts": alerts}
     
     if weather_data:
         response["weather"] = {
@@ -140,12 +274,7 @@ async def get_arrivals(
     
     log.info(
         "fulfilled",
-        spans={
-            "mta_ms": int((t_arrivals - t0) * 1000),
-            "alerts_ms": int((t_alerts - t_arrivals) * 1000),
-            "weather_ms": int((t_weather - t_alerts) * 1000),
-            "aqi_ms": int((t_aqi - t_weather) * 1000),
-        },
+        spans=spans,
     )
     
     return response
@@ -7,7 +7,11 @@ https://open-meteo.com/en/docs/air-quality-api
 
 from dataclasses import dataclass
 
-import httpx
+import aiohttp
+import orjson
+
+from services.breaker import Breaker, CircuitOpenError
+from services.cache import TTLCache
 
 
 @dataclass
@@ -16,6 +20,12 @@ class AirQuality:
     level: int  # 1-6 matching firmware's aqi_lvl index
 
 
+# Open-Meteo publishes hourly air quality values
+_aqi_cache: TTLCache[AirQuality] = TTLCache(ttl=300)
+
+_breaker = Breaker("open-meteo-aqi")
+
+
 def _aqi_to_level(aqi: int) -> int:
     """
     Convert US AQI value to level index (1-6).
@@ -35,18 +45,34 @@ def _aqi_to_level(aqi: int) -> int:
         return 6  # Hazardous
 
 
-async def get_aqi(lat: float, lon: float, client: httpx.AsyncClient) -> AirQuality | None:
+async def get_aqi(lat: float, lon: float, client: aiohttp.ClientSession) -> AirQuality | None:
     """
     Fetch current Air Quality Index from Open-Meteo.
 
+    Results are cached for a few minutes per location, rounded to 3 decimals (~100m).
+
     Args:
         lat: Latitude (decimal degrees)
         lon: Longitude (decimal degrees)
-        client: httpx async client for making requests
+        client: aiohttp session for making requests
 
     Returns:
         AirQuality dataclass with US AQI value and level, or None on error.
+        While Open-Meteo is failing, the last known value is returned instead.
     """
+    key = (round(lat, 3), round(lon, 3))
+    try:
+        return await _aqi_cache.get_or_fetch(key, lambda: _fetch_aqi(lat, lon, client))
+    except CircuitOpenError:
+        return _aqi_cache.get_stale(key)
+
+
+def get_cached_aqi(lat: float, lon: float) -> AirQuality | None:
+    """Return the last known AQI for a location regardless of age, without a request."""
+    return _aqi_cache.get_stale((round(lat, 3), round(lon, 3)))
+
+
+async def _fetch_aqi(lat: float, lon: float, client: aiohttp.ClientSession) -> AirQuality | None:
     try:
         url = "https://air-quality-api.open-meteo.com/v1/air-quality"
         params = {
@@ -55,9 +81,9 @@ async def get_aqi(lat: float, lon: float, client: httpx.AsyncClient) -> AirQuali
             "current": "us_aqi",
         }
 
-        response = await client.get(url, params=params, timeout=10.0)
-        response.raise_for_status()
-        data = response.json()
+        async with _breaker.guard(), client.get(url, params=params) as response:
+            response.raise_for_status()
+            data = orjson.loads(await response.read())
 
         aqi_value = int(data["current"]["us_aqi"])
 
@@ -66,5 +92,5 @@ async def get_aqi(lat: float, lon: float, client: httpx.AsyncClient) -> AirQuali
             level=_aqi_to_level(aqi_value),
         )
 
-    except (httpx.RequestError, httpx.HTTPStatusError, KeyError, ValueError):
+    except (aiohttp.ClientError, TimeoutError, KeyError, ValueError):
         return None
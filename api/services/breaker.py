@@ -0,0 +1,93 @@
+"""
+Circuit breaker and concurrency limit for upstream services.
+
+When an upstream starts failing or hanging, every request would otherwise wait
+out its timeout while holding a pooled connection. After repeated failures the
+breaker opens and calls fail fast with CircuitOpenError; once the recovery
+timeout has passed a single probe request is let through to test the upstream.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class Breaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        max_concurrency: int = 32,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = Breaker.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def allow_request(self) -> bool:
+        if self.state == Breaker.CLOSED:
+            return True
+
+        # OPEN, or HALF_OPEN with a probe in flight: wait out the recovery timeout.
+        # Restarting the timer on each probe means a probe that never reports back
+        # (e.g. cancelled) can't wedge the breaker half-open.
+        if time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self.state = Breaker.HALF_OPEN
+            self._opened_at = time.monotonic()
+            return True
+
+        return False
+
+    def _short_circuited(self) -> bool:
+        """True while open (or probing) and the recovery timeout hasn't passed; doesn't change state."""
+        return (
+            self.state != Breaker.CLOSED
+            and time.monotonic() - self._opened_at < self.recovery_timeout
+        )
+
+    def record_success(self) -> None:
+        self.state = Breaker.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == Breaker.HALF_OPEN or self._failures >= self.failure_threshold:
+            self.state = Breaker.OPEN
+            self._opened_at = time.monotonic()
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        Run an upstream call under the breaker and concurrency limit.
+
+        Raises CircuitOpenError without calling upstream while the breaker is open.
+        Any exception raised inside the block counts as a failure.
+        """
+        # Fail fast without queueing on the semaphore while open...
+        if self._short_circuited():
+            raise CircuitOpenError(self.name)
+
+        async with self._semaphore:
+            # ...and re-check once admitted, since the breaker may have opened while we waited
+            if not self.allow_request():
+                raise CircuitOpenError(self.name)
+
+            try:
+                yield
+            except Exception:
+                self.record_failure()
+                raise
+            self.record_success()
@@ -0,0 +1,85 @@
+"""
+In-process TTL cache for upstream responses.
+
+Upstream data changes far slower than clients poll (MTA feeds refresh every
+~30s, weather and AQI hourly), so responses are kept for a short time and
+shared between requests. Concurrent misses for the same key share a single
+in-flight fetch, so only one request goes upstream and all of them get its
+result or its error.
+
+Keys can come from client input (coordinates), so entries are kept in a
+size-capped LRU and in-flight fetches are forgotten as soon as they finish.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    def __init__(self, ttl: float, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    def get(self, key: Hashable) -> T | None:
+        """Return the cached value if it is still fresh, else None."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_stale(self, key: Hashable) -> T | None:
+        """Return the last cached value regardless of age, for use when upstream is down."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: T) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        # Evict least recently used entries beyond the cap
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[T | None]]) -> T | None:
+        """
+        Return the cached value for key, calling fetch() on a miss.
+
+        Concurrent misses share a single in-flight fetch and all receive its
+        result or its exception; nothing is retried behind it. None results are
+        not cached, so a failed fetch is retried by the next caller.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._fetch_done(key, t))
+
+        # Shielded so one caller being cancelled doesn't cancel the fetch for the rest
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[T | None]]) -> T | None:
+        value = await fetch()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def _fetch_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
@@ -6,12 +6,17 @@ No API key required.
 """
 
 import asyncio
+import heapq
 import time
 from dataclasses import dataclass
+from operator import attrgetter
 
-import httpx
+import aiohttp
+import orjson
 from google.transit import gtfs_realtime_pb2
 
+from services.breaker import Breaker, CircuitOpenError
+from services.cache import TTLCache
 from stations import MTA_STATIONS
 
 # Feed URLs grouped by lines they serve
@@ -26,8 +31,23 @@ FEED_URLS: dict[str, str] = {
     "SIR": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-si",
 }
 
+# Inverse of FEED_URLS for O(1) lookup. Keys are one character per line,
+# except Staten Island Railway, whose trips carry route_id "SI" (SIR kept as an alias).
+LINE_TO_FEED: dict[str, str] = {
+    line: url
+    for lines_key, url in FEED_URLS.items()
+    for line in (("SI", "SIR") if lines_key == "SIR" else lines_key)
+}
+
 ALERTS_URL = "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/camsys%2Fsubway-alerts.json"
 
+# MTA regenerates the realtime feeds roughly every 30s; alerts change far less often
+_feed_cache: TTLCache[bytes] = TTLCache(ttl=15)
+_alerts_cache: TTLCache[dict] = TTLCache(ttl=60)
+
+# Feeds and alerts are served by the same MTA endpoint
+_breaker = Breaker("mta")
+
 
 @dataclass
 class Arrival:
@@ -37,27 +57,59 @@ class Arrival:
     minutes: int
 
 
-def _feed_url_for_line(line: str) -> str | None:
-    """Return the GTFS feed URL that contains data for the given line."""
-    for lines_key, url in FEED_URLS.items():
-        if line.upper() in lines_key:
-            return url
-    return None
+async def _download_feed(url: str, client: aiohttp.ClientSession) -> bytes:
+    """Download the raw GTFS-realtime protobuf for a feed."""
+    async with _breaker.guard(), client.get(url) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+async def _fetch_feed(url: str, client: aiohttp.ClientSession) -> bytes:
+    """Return the raw feed bytes, served from cache while fresh (or stale while MTA is down)."""
+    try:
+        return await _feed_cache.get_or_fetch(url, lambda: _download_feed(url, client))
+    except CircuitOpenError:
+        stale = _feed_cache.get_stale(url)
+        if stale is None:
+            raise
+        return stale
+
+
+async def _download_alerts(client: aiohttp.ClientSession) -> dict:
+    async with (
+        _breaker.guard(),
+        client.get(ALERTS_URL, timeout=aiohttp.ClientTimeout(total=5)) as response,
+    ):
+        response.raise_for_status()
+        return orjson.loads(await response.read())
 
 
 def _parse_arrivals(
     feed_data: bytes,
-    station_ids: set[str],
-    lines: set[str],
+    station_ids: frozenset[str],
+    lines: frozenset[str],
     now: float,
-) -> list[Arrival]:
-    """Parse GTFS-realtime feed and extract arrivals for requested stations/lines."""
+    include_alerts: bool = False,
+) -> tuple[list[Arrival], set[str]]:
+    """
+    Parse GTFS-realtime feed and extract arrivals (and, if asked, active alerts) for requested stations/lines.
+
+    station_ids must already contain the N/S platform IDs to match (see get_arrivals).
+    """
     feed = gtfs_realtime_pb2.FeedMessage()
     feed.ParseFromString(feed_data)
 
     arrivals: list[Arrival] = []
+    alerts: set[str] = set()
+    now_int = int(now)
 
     for entity in feed.entity:
+        if include_alerts and entity.HasField("alert"):
+            text = _feed_alert_text(entity.alert, lines, now_int)
+            if text:
+                alerts.add(text)
+            continue
+
         if not entity.HasField("trip_update"):
             continue
 
@@ -67,29 +119,25 @@ def _parse_arrivals(
         if route_id not in lines:
             continue
 
-        for stop_update in trip.stop_time_update:
+        stop_updates = trip.stop_time_update
+        if not stop_updates:
+            continue
+
+        # Terminal station is the trip's last stop, same for every stop on it
+        terminal_name = MTA_STATIONS.get(stop_updates[-1].stop_id, "Unknown")
+
+        for stop_update in stop_updates:
             stop_id = stop_update.stop_id
             
-            # Match exact stop_id or base station (e.g., "L06" matches "L06N" and "L06S")
-            matches = (
-                stop_id in station_ids
-                or (len(stop_id) > 1 and stop_id[:-1] in station_ids)
-            )
-            
-            if not matches:
+            # station_ids already includes the N/S platforms of each base station
+            if stop_id not in station_ids:
                 continue
 
-            arrival_time = stop_update.arrival.time
-            minutes = (arrival_time - now) / 60
-
-            # Skip arrivals in the past or too far in the future
-            if minutes < 0 or minutes > 200:
+            # Skip arrivals in the past or more than 200 minutes out
+            delta = stop_update.arrival.time - now_int
+            if delta < 0 or delta > 12000:
                 continue
 
-            # Get terminal station name
-            terminal_stop_id = trip.stop_time_update[-1].stop_id
-            terminal_name = MTA_STATIONS.get(terminal_stop_id, "Unknown")
-
             # Extract direction from stop_id suffix (N/S)
             # MTA stop_ids end with N or S (e.g., "L06N", "L06S")
             direction = stop_id[-1] if stop_id[-1] in ("N", "S") else "N"
@@ -99,17 +147,36 @@ def _parse_arrivals(
                     line=route_id,
                     direction=direction,
                     terminal=terminal_name,
-                    minutes=0 if minutes < 1 else round(minutes),
+                    minutes=0 if delta < 60 else (delta + 30) // 60,
                 )
             )
 
-    return arrivals
+    return arrivals, alerts
+
+
+def _feed_alert_text(alert: gtfs_realtime_pb2.Alert, lines: frozenset[str], now_int: int) -> str | None:
+    """Return the header text of a GTFS-realtime Alert if it is active and affects one of lines."""
+    if not any(informed.route_id in lines for informed in alert.informed_entity):
+        return None
+
+    # No active_period means always active; a 0 start/end is an open-ended bound
+    periods = alert.active_period
+    if periods and not any(
+        p.start <= now_int and (not p.end or now_int < p.end) for p in periods
+    ):
+        return None
+
+    translations = alert.header_text.translation
+    if not translations:
+        return None
+    return translations[0].text.replace("\n", " ").strip() or None
 
 
 async def get_arrivals(
     station_ids: set[str],
     lines: set[str],
-    client: httpx.AsyncClient,
+    client: aiohttp.ClientSession,
+    include_alerts: bool = False,
 ) -> dict:
     """
     Fetch MTA subway arrivals for the given stations and lines.
@@ -117,49 +184,61 @@ async def get_arrivals(
     Args:
         station_ids: Set of station IDs (e.g., {"A32N", "A32S"})
         lines: Set of subway lines (e.g., {"A", "C", "E"})
-        client: httpx async client for making requests
+        client: aiohttp session for making requests
+        include_alerts: Also return alerts carried in the GTFS-realtime feeds,
+            saving the separate get_alerts round-trip
 
     Returns:
         Dict with "North" and "South" keys, each containing sorted arrival lists.
         Format matches legacy API for firmware backward compatibility.
+        With include_alerts, an "alerts" key holds alert text strings as in get_alerts.
     """
     now = time.time()
 
+    # Expand base stations to their platforms (e.g., "L06" -> "L06N", "L06S")
+    # so the parser matches each stop with a single set lookup
+    station_ids = frozenset(
+        stop_id for s in station_ids for stop_id in (s, s + "N", s + "S")
+    )
+    lines = frozenset(lines)
+
     # Determine which feeds we need to fetch
-    urls_to_fetch = set()
-    for line in lines:
-        url = _feed_url_for_line(line)
-        if url:
-            urls_to_fetch.add(url)
-
-    # Fetch all relevant feeds concurrently
-    responses = await asyncio.gather(
-        *[client.get(url) for url in urls_to_fetch],
+    urls_to_fetch = {LINE_TO_FEED[l.upper()] for l in lines if l.upper() in LINE_TO_FEED}
+
+    async def fetch_and_parse(url: str) -> tuple[list[Arrival], set[str]]:
+        feed_data = await _fetch_feed(url, client)
+        # Parse off the event loop so other feeds keep downloading meanwhile
+        return await asyncio.to_thread(
+            _parse_arrivals, feed_data, station_ids, lines, now, include_alerts
+        )
+
+    # Fetch and parse all relevant feeds concurrently
+    results = await asyncio.gather(
+        *[fetch_and_parse(url) for url in urls_to_fetch],
         return_exceptions=True,
     )
 
-    # Parse arrivals from all feeds
     all_arrivals: list[Arrival] = []
-    for response in responses:
-        if isinstance(response, Exception):
+    all_alerts: set[str] = set()
+    for result in results:
+        if isinstance(result, Exception):
             continue
-        all_arrivals.extend(
-            _parse_arrivals(response.content, station_ids, lines, now)
-        )
+        arrivals, alerts = result
+        all_arrivals.extend(arrivals)
+        all_alerts |= alerts
 
-    # Split by direction and sort by arrival time
-    north = sorted(
-        [a for a in all_arrivals if a.direction == "N"],
-        key=lambda a: a.minutes,
-    )[:11]
+    # Split by direction and keep the soonest arrivals in each
+    north_all: list[Arrival] = []
+    south_all: list[Arrival] = []
+    for a in all_arrivals:
+        (south_all if a.direction == "S" else north_all).append(a)
 
-    south = sorted(
-        [a for a in all_arrivals if a.direction == "S"],
-        key=lambda a: a.minutes,
-    )[:11]
+    by_minutes = attrgetter("minutes")
+    north = heapq.nsmallest(11, north_all, key=by_minutes)
+    south = heapq.nsmallest(11, south_all, key=by_minutes)
 
     # Format for backward compatibility with firmware
-    return {
+    response = {
         "North": [
             {
                 "Line": a.line,
@@ -180,42 +259,51 @@ async def get_arrivals(
         ],
     }
 
+    if include_alerts:
+        response["alerts"] = list(all_alerts)
+
+    return response
+
 
-async def get_alerts(lines: set[str], client: httpx.AsyncClient) -> list[str]:
+async def get_alerts(lines: set[str], client: aiohttp.ClientSession) -> list[str]:
     """
     Fetch active service alerts for the given subway lines.
 
     Args:
         lines: Set of subway lines (e.g., {"A", "C", "E"})
-        client: httpx async client for making requests
+        client: aiohttp session for making requests
 
     Returns:
         List of alert text strings for affected lines.
     """
     try:
-        response = await client.get(ALERTS_URL, timeout=5.0)
-        response.raise_for_status()
-        data = response.json()
-    except (httpx.RequestError, httpx.HTTPStatusError):
+        data = await _alerts_cache.get_or_fetch(ALERTS_URL, lambda: _download_alerts(client))
+    except CircuitOpenError:
+        data = _alerts_cache.get_stale(ALERTS_URL)
+        if data is None:
+            return []
+    except (aiohttp.ClientError, TimeoutError):
         return []
 
     now = int(time.time())
     active_alerts: set[str] = set()
 
-    for alert in data.get("entity", []):
-        try:
-            alert_info = alert["alert"]
-            route_id = alert_info["informed_entity"][0]["route_id"]
+    # Alerts often lack fields (e.g. no route_id), so walk them with .get()
+    # rather than paying for a raised KeyError on each one
+    for alert in data.get("entity") or ():
+        alert_info = alert.get("alert") or {}
 
-            if route_id not in lines:
-                continue
+        informed = alert_info.get("informed_entity") or ()
+        if not informed or informed[0].get("route_id") not in lines:
+            continue
 
-            for period in alert_info["active_period"]:
-                if period["start"] < now < period["end"]:
-                    text = alert_info["header_text"]["translation"][0]["text"]
-                    active_alerts.add(text.replace("\n", " ").strip())
-                    break
-        except (KeyError, IndexError):
+        translations = (alert_info.get("header_text") or {}).get("translation") or ()
+        if not translations or "text" not in translations[0]:
             continue
 
+        for period in alert_info.get("active_period") or ():
+            if period.get("start", now) < now < period.get("end", now):
+                active_alerts.add(translations[0]["text"].replace("\n", " ").strip())
+                break
+
     return list(active_alerts)
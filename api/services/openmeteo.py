@@ -0,0 +1,148 @@
+"""
+Current weather and air quality from Open-Meteo.
+
+Free, no API key required, global coverage.
+https://open-meteo.com/en/docs
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+import aiohttp
+import orjson
+
+from services import aqi
+from services.aqi import AirQuality
+from services.breaker import Breaker, CircuitOpenError
+from services.cache import TTLCache
+
+
+@dataclass
+class Weather:
+    temp_f: int
+    feels_like_f: int | None
+    conditions: str
+
+
+@dataclass
+class Conditions:
+    weather: Weather | None
+    aqi: AirQuality | None
+
+
+# WMO weather interpretation codes → short forecast text
+# https://open-meteo.com/en/docs#weather_variable_documentation
+WEATHER_CODES: dict[int, str] = {
+    0: "Clear",
+    1: "Mostly Clear",
+    2: "Partly Cloudy",
+    3: "Cloudy",
+    45: "Fog",
+    48: "Freezing Fog",
+    51: "Light Drizzle",
+    53: "Drizzle",
+    55: "Heavy Drizzle",
+    56: "Freezing Drizzle",
+    57: "Freezing Drizzle",
+    61: "Light Rain",
+    63: "Rain",
+    65: "Heavy Rain",
+    66: "Freezing Rain",
+    67: "Freezing Rain",
+    71: "Light Snow",
+    73: "Snow",
+    75: "Heavy Snow",
+    77: "Snow Grains",
+    80: "Rain Showers",
+    81: "Rain Showers",
+    82: "Heavy Rain Showers",
+    85: "Snow Showers",
+    86: "Heavy Snow Showers",
+    95: "Thunderstorms",
+    96: "Thunderstorms",
+    99: "Thunderstorms",
+}
+
+# Open-Meteo refreshes current conditions every 15 minutes
+_weather_cache: TTLCache[Weather] = TTLCache(ttl=300)
+
+_breaker = Breaker("open-meteo")
+
+
+async def get_conditions(lat: float, lon: float, client: aiohttp.ClientSession) -> Conditions:
+    """
+    Fetch current weather and air quality for a location.
+
+    The forecast and air-quality APIs live on separate Open-Meteo hosts,
+    so both are requested concurrently.
+
+    Args:
+        lat: Latitude (decimal degrees)
+        lon: Longitude (decimal degrees)
+        client: aiohttp session for making requests
+
+    Returns:
+        Conditions with weather and AQI; either field is None if unavailable.
+    """
+    weather, air_quality = await asyncio.gather(
+        get_weather(lat, lon, client),
+        aqi.get_aqi(lat, lon, client),
+    )
+    return Conditions(weather=weather, aqi=air_quality)
+
+
+def get_cached_conditions(lat: float, lon: float) -> Conditions:
+    """Return the last known weather and AQI for a location regardless of age, without a request."""
+    return Conditions(
+        weather=_weather_cache.get_stale((round(lat, 3), round(lon, 3))),
+        aqi=aqi.get_cached_aqi(lat, lon),
+    )
+
+
+async def get_weather(lat: float, lon: float, client: aiohttp.ClientSession) -> Weather | None:
+    """
+    Fetch current weather from the Open-Meteo forecast API.
+
+    Results are cached for a few minutes per location, rounded to 3 decimals (~100m).
+
+    Args:
+        lat: Latitude (decimal degrees)
+        lon: Longitude (decimal degrees)
+        client: aiohttp session for making requests
+
+    Returns:
+        Weather dataclass with temperature and conditions, or None on error.
+        While Open-Meteo is failing, the last known weather is returned instead.
+    """
+    key = (round(lat, 3), round(lon, 3))
+    try:
+        return await _weather_cache.get_or_fetch(key, lambda: _fetch_weather(lat, lon, client))
+    except CircuitOpenError:
+        return _weather_cache.get_stale(key)
+
+
+async def _fetch_weather(lat: float, lon: float, client: aiohttp.ClientSession) -> Weather | None:
+    try:
+        url = "https://api.open-meteo.com/v1/forecast"
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "current": "temperature_2m,apparent_temperature,weather_code",
+            "temperature_unit": "fahrenheit",
+        }
+
+        async with _breaker.guard(), client.get(url, params=params) as response:
+            response.raise_for_status()
+            data = orjson.loads(await response.read())
+
+        current = data["current"]
+        feels_like = current.get("apparent_temperature")
+
+        return Weather(
+            temp_f=round(current["temperature_2m"]),
+            feels_like_f=round(feels_like) if feels_like is not None else None,
+            conditions=WEATHER_CODES.get(current["weather_code"], "Unknown"),
+        )
+
+    except (aiohttp.ClientError, TimeoutError, KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from services.breaker import Breaker, CircuitOpenError
+from services.cache import TTLCache
+
+
+class UpstreamError(Exception):
+    pass
+
+
+async def call(breaker: Breaker, fail: bool = False) -> None:
+    async with breaker.guard():
+        if fail:
+            raise UpstreamError
+
+
+async def trip(breaker: Breaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(UpstreamError):
+            await call(breaker, fail=True)
+
+
+async def test_opens_after_threshold_and_fails_fast():
+    breaker = Breaker("test", failure_threshold=3, recovery_timeout=60)
+    await trip(breaker)
+
+    assert breaker.state == Breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        await call(breaker)
+
+
+async def test_success_resets_failure_count():
+    breaker = Breaker("test", failure_threshold=2, recovery_timeout=60)
+
+    with pytest.raises(UpstreamError):
+        await call(breaker, fail=True)
+    await call(breaker)
+    with pytest.raises(UpstreamError):
+        await call(breaker, fail=True)
+
+    assert breaker.state == Breaker.CLOSED
+
+
+async def test_half_open_probe_failure_reopens():
+    breaker = Breaker("test", failure_threshold=1, recovery_timeout=0.01)
+    await trip(breaker)
+    await asyncio.sleep(0.02)
+
+    with pytest.raises(UpstreamError):
+        await call(breaker, fail=True)
+
+    assert breaker.state == Breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        await call(breaker)
+
+
+async def test_half_open_probe_success_closes():
+    breaker = Breaker("test", failure_threshold=1, recovery_timeout=0.01)
+    await trip(breaker)
+    await asyncio.sleep(0.02)
+
+    await call(breaker)
+
+    assert breaker.state == Breaker.CLOSED
+    await call(breaker)
+
+
+async def test_half_open_admits_a_single_probe():
+    breaker = Breaker("test", failure_threshold=1, recovery_timeout=0.01)
+    await trip(breaker)
+    await asyncio.sleep(0.02)
+
+    release = asyncio.Event()
+
+    async def probe():
+        async with breaker.guard():
+            await release.wait()
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    assert breaker.state == Breaker.HALF_OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await call(breaker)
+
+    release.set()
+    await probe_task
+    assert breaker.state == Breaker.CLOSED
+
+
+async def test_queued_callers_recheck_after_breaker_opens():
+    breaker = Breaker("test", failure_threshold=1, recovery_timeout=60, max_concurrency=1)
+    release = asyncio.Event()
+    upstream_calls = 0
+
+    async def failing_call():
+        nonlocal upstream_calls
+        async with breaker.guard():
+            upstream_calls += 1
+            await release.wait()
+            raise UpstreamError
+
+    first = asyncio.create_task(failing_call())
+    await asyncio.sleep(0)
+    # Queued on the semaphore while the breaker is still closed
+    queued = asyncio.create_task(failing_call())
+    await asyncio.sleep(0)
+
+    release.set()
+    with pytest.raises(UpstreamError):
+        await first
+    with pytest.raises(CircuitOpenError):
+        await queued
+    assert upstream_calls == 1
+
+
+async def test_cached_single_flight_makes_one_upstream_call_while_failing():
+    breaker = Breaker("test", failure_threshold=5, recovery_timeout=60)
+    cache: TTLCache[bytes] = TTLCache(ttl=15)
+    upstream_calls = 0
+
+    async def download():
+        nonlocal upstream_calls
+        async with breaker.guard():
+            upstream_calls += 1
+            await asyncio.sleep(0.01)
+            raise UpstreamError
+
+    results = await asyncio.gather(
+        *[cache.get_or_fetch("feed", download) for _ in range(8)],
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, UpstreamError) for r in results)
+    assert upstream_calls == 1
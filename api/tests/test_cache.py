@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from services.cache import TTLCache
+
+
+async def test_concurrent_misses_share_one_fetch():
+    cache: TTLCache[str] = TTLCache(ttl=60)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*[cache.get_or_fetch("k", fetch) for _ in range(10)])
+
+    assert results == ["value"] * 10
+    assert calls == 1
+    assert cache.get("k") == "value"
+    assert not cache._inflight
+
+
+async def test_concurrent_misses_share_one_failure():
+    cache: TTLCache[str] = TTLCache(ttl=60)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise TimeoutError
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.gather(
+        *[cache.get_or_fetch("k", fetch) for _ in range(4)],
+        return_exceptions=True,
+    )
+
+    # Every waiter gets the one failure at once instead of retrying in turn
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert calls == 1
+    assert loop.time() - start < 0.15
+    assert not cache._inflight
+    assert cache.get_stale("k") is None
+
+
+async def test_none_is_not_cached():
+    cache: TTLCache[str] = TTLCache(ttl=60)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return None
+
+    assert await cache.get_or_fetch("k", fetch) is None
+    assert await cache.get_or_fetch("k", fetch) is None
+    assert calls == 2
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_fetch():
+    cache: TTLCache[str] = TTLCache(ttl=60)
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "value"
+
+    first = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    second = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    release.set()
+    assert await second == "value"
+    assert cache.get("k") == "value"
+    assert not cache._inflight
+
+
+async def test_inflight_cleared_when_all_waiters_cancelled():
+    cache: TTLCache[str] = TTLCache(ttl=60)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream broke")
+
+    waiter = asyncio.create_task(cache.get_or_fetch("k", fetch))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    await asyncio.sleep(0.02)
+    assert not cache._inflight
+
+
+async def test_expired_entry_only_served_as_stale():
+    cache: TTLCache[str] = TTLCache(ttl=0)
+    cache.set("k", "old")
+
+    assert cache.get("k") is None
+    assert cache.get_stale("k") == "old"
+
+
+def test_max_size_evicts_least_recently_used():
+    cache: TTLCache[str] = TTLCache(ttl=60, max_size=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get_stale("a")  # touch "a" so "b" is now least recently used
+    cache.set("c", "3")
+
+    assert cache.get_stale("a") == "1"
+    assert cache.get_stale("b") is None
+    assert cache.get_stale("c") == "3"